@@ -10,35 +10,185 @@ import argparse
 import chess
 import chess.pgn
 import chess.engine
+import chess.polyglot
+import concurrent.futures
 import io
+import numpy as np
+import queue
+import sys
 import time
+from dataclasses import dataclass
 from typing import List, Optional
 
 # Configuration globals
+NUM_WORKERS = 4  # Number of parallel Stockfish workers (each single-threaded)
 TIME_LIMIT = 11.0  # Seconds per engine call for move analysis
 QUICK_ANALYSIS_TIME = 0.1  # Seconds per move for quick analysis of early moves
+QUICK_ANALYSIS_DEPTH = 12  # Depth bound for quick analysis; reached almost instantly on a warm hash table
 QUICK_ANALYSIS_PLY = 50  # Number of ply moves to use quick analysis (25 moves = 50 ply)
 # PV (Principal Variation) is the best line of play the engine calculates - showing the sequence of moves
 # the engine thinks is optimal.
 TOP_N = 20  # Number of worst moves to display
 GAME_OVER_EVAL_THRESHOLD = 10.0  # Evaluation threshold (pawns) to detect game over and use quick analysis
+LOG_FLUSH_INTERVAL = 10  # Buffered progress lines are written out in batches of this size
 ANALYSIS_MODE = "stability"  # Analysis mode: "time" for fixed time limits, "stability" for stability-based stopping
 STABILITY_THRESHOLD = 10.0  # Seconds of no changes to best move before stopping (stability mode only)
 
 
+@dataclass(slots=True)
+class MoveAnalysis:
+    """Per-move record produced by GameAnalyzer.analyze_game."""
+    move_number: int
+    player: str
+    move: chess.Move
+    san: str
+    eval_before: Optional[float]
+    eval_after: Optional[float]
+    eval_change: Optional[float]
+    board_key: int
+    pre_move_key: int
+    ply_index: int
+    time_taken_before: float
+    time_taken_after: float
+    position_analysis: dict
+
+
+_ZOBRIST_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+class ZobristBoard(chess.Board):
+    """
+    chess.Board that keeps its Polyglot Zobrist hash up to date incrementally:
+    push/pop XOR the affected piece-square, castling, en passant and turn keys
+    instead of recomputing the whole hash (or serializing a FEN) per position.
+    """
+
+    def __init__(self, fen: Optional[str] = chess.STARTING_FEN, *, chess960: bool = False):
+        super().__init__(fen, chess960=chess960)
+        self._zhash = chess.polyglot.zobrist_hash(self)
+
+    @property
+    def zobrist_key(self) -> int:
+        return self._zhash
+
+    @staticmethod
+    def _move_squares(move: chess.Move) -> set:
+        """
+        Squares whose occupancy a move could touch. Over-approximating is
+        harmless (an unchanged piece XORs itself out), but each square must
+        appear only once, hence the set.
+        """
+        squares = {move.from_square, move.to_square}
+        # Possible en passant capture square
+        if move.to_square >= 8:
+            squares.add(move.to_square - 8)
+        if move.to_square < 56:
+            squares.add(move.to_square + 8)
+        # Possible castling rook squares (king moved two files on one rank)
+        if (chess.square_rank(move.from_square) == chess.square_rank(move.to_square)
+                and abs(chess.square_file(move.from_square) - chess.square_file(move.to_square)) >= 2):
+            rank = chess.square_rank(move.from_square)
+            for file in (0, 3, 5, 7):
+                squares.add(chess.square(file, rank))
+        return squares
+
+    def _piece_keys(self, squares: set) -> int:
+        keys = 0
+        array = _ZOBRIST_HASHER.array
+        for square in squares:
+            piece = self.piece_at(square)
+            if piece:
+                keys ^= array[64 * ((piece.piece_type - 1) * 2 + piece.color) + square]
+        return keys
+
+    def _state_keys(self) -> int:
+        return (_ZOBRIST_HASHER.hash_castling(self)
+                ^ _ZOBRIST_HASHER.hash_ep_square(self)
+                ^ _ZOBRIST_HASHER.hash_turn(self))
+
+    def push(self, move: chess.Move) -> None:
+        squares = self._move_squares(move)
+        h = self._zhash ^ self._state_keys() ^ self._piece_keys(squares)
+        super().push(move)
+        self._zhash = h ^ self._piece_keys(squares) ^ self._state_keys()
+
+    def pop(self) -> chess.Move:
+        squares = self._move_squares(self.move_stack[-1])
+        h = self._zhash ^ self._state_keys() ^ self._piece_keys(squares)
+        move = super().pop()
+        self._zhash = h ^ self._piece_keys(squares) ^ self._state_keys()
+        return move
+
+    def set_fen(self, fen: str) -> None:
+        super().set_fen(fen)
+        self._zhash = chess.polyglot.zobrist_hash(self)
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        board._zhash = self._zhash  # same position, same hash
+        return board
+
+
 class GameAnalyzer:
     def __init__(self, stockfish_path: str = "/usr/bin/stockfish"):
         self.stockfish_path = stockfish_path
-        self.engine = None
-
-    def __enter__(self):
-        self.engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
-        self.engine.configure({"Hash": 8192, "Threads": 4})  # Adjust to hardware
+        self.engine: Optional[chess.engine.SimpleEngine] = None
+        self.engine_pool: List[chess.engine.SimpleEngine] = []
+        self._engine_queue: Optional[queue.Queue] = None
+        # Analyses keyed by Zobrist hash; repetitions and transpositions
+        # (common in perpetual-check and shuffling sequences) hit the cache
+        # instead of paying another engine call. Positions never change per
+        # FEN, so entries are never invalidated.
+        self._pos_cache: dict = {}
+        # Per-move progress lines are buffered and written in batches so the
+        # main thread isn't issuing a write() syscall per move while the
+        # engine reader threads contend for the GIL.
+        self._log_buf: List[str] = []
+        # Deep-analysis implementation; __enter__ rebinds this per
+        # ANALYSIS_MODE so analyze_position dispatches without a branch.
+        self._deep_analyze = self._analyze_position_time
+        # Per-game identifier passed to the engines: python-chess sends
+        # ucinewgame only when it changes, so the hash table persists across
+        # positions of one game and is reset between games of a batch.
+        self._game_token: Optional[object] = None
+
+    def __enter__(self) -> "GameAnalyzer":
+        # One single-threaded engine per worker scales better in wall-clock
+        # than a single engine with Threads=N (lazy SMP is sub-linear).
+        warm_up_board = chess.Board()
+        for _ in range(NUM_WORKERS):
+            engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+            options = {"Hash": 2048, "Threads": 1}  # Adjust to hardware
+            # Older Stockfish builds expose "Use NNUE"; current ones are
+            # NNUE-only and dropped the option. Ponder and MultiPV are
+            # managed by python-chess itself and can't be set here.
+            if "Use NNUE" in engine.options:
+                options["Use NNUE"] = True
+            engine.configure(options)
+            # Throwaway depth-1 search: pays the NNUE net load and hash
+            # allocation up front rather than on the first real position.
+            # python-chess only sends ucinewgame when the game identifier
+            # changes, so the transposition table then persists across all
+            # analyse calls for the same game.
+            engine.analyse(warm_up_board, chess.engine.Limit(depth=1))
+            self.engine_pool.append(engine)
+        self._engine_queue = queue.Queue()
+        for engine in self.engine_pool:
+            self._engine_queue.put(engine)
+        # Single-position entry points (deep analysis mode) use the first engine.
+        self.engine = self.engine_pool[0]
+        # Freeze the mode dispatch once instead of re-testing ANALYSIS_MODE
+        # on every analyze_position call.
+        self._deep_analyze = (self._analyze_position_stability
+                              if ANALYSIS_MODE == "stability"
+                              else self._analyze_position_time)
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.engine:
-            self.engine.quit()
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        for engine in self.engine_pool:
+            engine.quit()
+        self.engine_pool = []
+        self.engine = None
 
     def load_game_from_pgn(self, pgn_string: str) -> chess.pgn.Game:
         """Load a game from PGN string."""
@@ -47,94 +197,259 @@ class GameAnalyzer:
         return game
 
 
-    def analyze_game(self, game: chess.pgn.Game) -> List[dict]:
+    def analyze_game(self, game: chess.pgn.Game) -> List[MoveAnalysis]:
         """
         Single-pass analysis: analyze each position once and collect move data.
-        
+
+        The post-move positions are dispatched across the engine pool, so the
+        wall clock scales with the number of workers rather than one engine.
+
         Args:
             game: The chess game to analyze
-            
+
         Returns:
-            List of dictionaries with move analysis data
+            List of MoveAnalysis records, one per ply
         """
-        if not self.engine:
-            raise RuntimeError("Engine not initialized. Use with statement.")
+        if not self.engine_pool:
+            raise RuntimeError("Engines not initialized. Use with statement.")
 
         mainline_nodes = list(game.mainline())
         total_moves = len(mainline_nodes)
-        
+
         if ANALYSIS_MODE == "stability":
             mode_info = f"stability mode (stable for {STABILITY_THRESHOLD}s)"
         else:
             mode_info = f"time mode (first {QUICK_ANALYSIS_PLY} ply: {QUICK_ANALYSIS_TIME}s, rest: {TIME_LIMIT}s per move)"
-        
-        print(f"\n=== Single Pass Analysis ({mode_info}) ===")
+
+        print(f"\n=== Single Pass Analysis ({mode_info}, {len(self.engine_pool)} workers) ===")
         print(f"Analyzing {total_moves} moves...\n")
-        
-        board = game.board()
-        moves_analysis = []
+
+        # Kick off the initial-position analysis right away so an engine is
+        # already thinking underneath the pure-Python mainline walk below --
+        # the per-move bookkeeping (SAN, hashing) hides under engine compute.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.engine_pool))
+        initial_future = executor.submit(self._analyze_with_pooled_engine,
+                                         ZobristBoard(game.board().fen()),
+                                         QUICK_ANALYSIS_TIME)
+
+        # Bind the hot config globals to locals once; the per-ply loops below
+        # then use LOAD_FAST lookups instead of a module-dict probe each.
+        quick_time = QUICK_ANALYSIS_TIME
+        quick_ply = QUICK_ANALYSIS_PLY
+        full_time = TIME_LIMIT
+        decided_threshold = GAME_OVER_EVAL_THRESHOLD
+
+        # Walk the game on a ZobristBoard: position identity is a u64 hash
+        # updated incrementally at push time, not a FEN serialization per ply.
+        board = ZobristBoard(game.board().fen())
         move_number = 1
-        ply_index = 0
-        
-        # Initial position analysis (before the first move)
-        current_analysis = self.analyze_position(board, QUICK_ANALYSIS_TIME)
-        
+
+        # One walk of the mainline fills parallel per-ply arrays (SoA layout)
+        # instead of a dict per move: everything the workers and the report
+        # need, indexed by ply.
+        moves: List[chess.Move] = []
+        sans: List[str] = []
+        players: List[str] = []
+        move_numbers: List[int] = []
+        pre_keys: List[int] = []
+        post_keys: List[int] = []
+        post_boards: List[chess.Board] = []
+        time_limits: List[float] = []
+        terminal_evals: List[Optional[float]] = []
+
         for node in mainline_nodes:
-            player = "White" if board.turn == chess.WHITE else "Black"
+            players.append("White" if board.turn == chess.WHITE else "Black")
             move = node.move
-            san_move = board.san(move)
-            pre_move_fen = board.fen()
-            
-            print(f"Analyzing: Move {move_number}. {player} {san_move} (ply {ply_index + 1}/{total_moves})...", flush=True)
-            
-            # Make the move
+            moves.append(move)
+            sans.append(board.san(move))
+            move_numbers.append(move_number)
+            pre_keys.append(board.zobrist_key)
+
             board.push(move)
-            
-            eval_before = current_analysis['evaluation']
-            
-            # Use quick analysis for first 50 ply moves, or if game is already decided
-            if ply_index + 1 < QUICK_ANALYSIS_PLY:
-                time_limit = QUICK_ANALYSIS_TIME
-            elif eval_before is not None and abs(eval_before) > GAME_OVER_EVAL_THRESHOLD:
-                time_limit = QUICK_ANALYSIS_TIME
-            else:
-                time_limit = TIME_LIMIT
-            
-            # Analyze position AFTER move
-            next_analysis = self.analyze_position(board, time_limit)
-            eval_after = next_analysis['evaluation']
-            
-            eval_change = self._calculate_eval_change(eval_before, eval_after)
-            
-            move_data = {
-                'move_number': move_number,
-                'player': player,
-                'move': move,
-                'san': san_move,
-                'eval_before': eval_before,
-                'eval_after': eval_after,
-                'eval_change': eval_change,
-                'board_fen': board.fen(),
-                'pre_move_fen': pre_move_fen,
-                'ply_index': ply_index,
-                'time_taken_before': current_analysis['time_taken'],
-                'time_taken_after': next_analysis['time_taken'],
-                'position_analysis': current_analysis
-            }
-            moves_analysis.append(move_data)
-            
-            # Update current analysis for next move
-            current_analysis = next_analysis
-            ply_index += 1
-            
-            if board.is_game_over():
+            post_keys.append(board.zobrist_key)
+            post_boards.append(board.copy(stack=False))
+
+            # Use quick analysis for the first QUICK_ANALYSIS_PLY ply moves.
+            # (The time limit has to be chosen at dispatch time now, so the
+            # quick/deep split is by ply rather than by the previous eval.)
+            time_limits.append(quick_time if len(moves) < quick_ply else full_time)
+
+            # Terminal position: the eval is known exactly (mate or draw),
+            # so skip the engine round-trip entirely. Mated side to move
+            # matches the +-99 mate cap used in _extract_evaluation. These
+            # are O(1) bitboard checks; is_game_over()'s repetition and
+            # 75-move clauses scan the move stack, O(ply^2) over the walk.
+            # A fivefold/75-move ending just gets analyzed normally instead.
+            terminal_eval = None
+            if board.is_checkmate():
+                terminal_eval = -99.0
+            elif board.is_stalemate() or board.is_insufficient_material():
+                terminal_eval = 0.0
+            terminal_evals.append(terminal_eval)
+
+            if terminal_eval is not None:
                 break
-            
+
             if board.turn == chess.WHITE:
                 move_number += 1
-            
+
+        n_plies = len(moves)
+
+        # Per-position eval/time arrays: index 0 is the initial position,
+        # index i + 1 the position after move i. NaN marks "no eval".
+        position_evals = np.full(n_plies + 1, np.nan)
+        position_times = np.zeros(n_plies + 1)
+        position_analyses: List[Optional[dict]] = [None] * (n_plies + 1)
+
+        # Initial position analysis (before the first move), overlapped with
+        # the walk above
+        initial_analysis = initial_future.result()
+        position_analyses[0] = initial_analysis
+        if initial_analysis['evaluation'] is not None:
+            position_evals[0] = initial_analysis['evaluation']
+        position_times[0] = initial_analysis['time_taken']
+
+        n_workers = len(self.engine_pool)
+        game_decided = False
+        with executor:
+            # Dispatch in pool-sized waves so the decided-position downgrade
+            # can key off evaluations collected from earlier waves.
+            for wave_start in range(0, n_plies, n_workers):
+                wave_end = min(wave_start + n_workers, n_plies)
+                futures = []
+                for i in range(wave_start, wave_end):
+                    if terminal_evals[i] is not None:
+                        futures.append(None)
+                        continue
+                    time_limit = quick_time if game_decided else time_limits[i]
+                    futures.append(executor.submit(self._analyze_with_pooled_engine,
+                                                   post_boards[i], time_limit))
+
+                # Collect in submission order; each position's eval is the
+                # previous move's eval_after and the next move's eval_before.
+                for i, future in zip(range(wave_start, wave_end), futures):
+                    if future is None:
+                        next_analysis = {
+                            'best_move': None,
+                            'evaluation': terminal_evals[i],
+                            'principal_variation': [],
+                            'time_taken': 0.0,
+                            'stable': True,
+                        }
+                    else:
+                        next_analysis = future.result()
+                    self._log(f"Analyzed: Move {move_numbers[i]}. {players[i]} {sans[i]} "
+                              f"(ply {i + 1}/{total_moves})")
+
+                    position_analyses[i + 1] = next_analysis
+                    if next_analysis['evaluation'] is not None:
+                        position_evals[i + 1] = next_analysis['evaluation']
+                    position_times[i + 1] = next_analysis['time_taken']
+
+                    # Once one side is clearly winning, later waves fall back
+                    # to quick analysis (NaN compares False, so no-eval plies
+                    # never trip this).
+                    if abs(position_evals[i + 1]) > decided_threshold:
+                        game_decided = True
+
+        self._flush_log()
+
+        # Eval changes for every ply in one vector op. Evals are relative to
+        # the side to move, so the post-move eval (opponent's perspective) is
+        # negated to compare from the mover's side; positive change means the
+        # move improved the position. NaN propagates where an eval is missing.
+        eval_changes = -position_evals[1:] - position_evals[:-1]
+
+        # Assemble the per-move records from the parallel arrays
+        moves_analysis = []
+        for i in range(n_plies):
+            eval_before = None if np.isnan(position_evals[i]) else float(position_evals[i])
+            eval_after = None if np.isnan(position_evals[i + 1]) else float(position_evals[i + 1])
+            moves_analysis.append(MoveAnalysis(
+                move_number=move_numbers[i],
+                player=players[i],
+                move=moves[i],
+                san=sans[i],
+                eval_before=eval_before,
+                eval_after=eval_after,
+                eval_change=None if np.isnan(eval_changes[i]) else float(eval_changes[i]),
+                board_key=post_keys[i],
+                pre_move_key=pre_keys[i],
+                ply_index=i,
+                time_taken_before=float(position_times[i]),
+                time_taken_after=float(position_times[i + 1]),
+                position_analysis=position_analyses[i],
+            ))
+
         return moves_analysis
 
+    def analyze_batch(self, pgn_paths: List[str]) -> None:
+        """
+        Analyze every game in the given PGN files on one warm engine pool.
+
+        The engines (with their NNUE nets loaded and hash allocated) are
+        opened once for the whole batch; a fresh game token makes python-chess
+        issue ucinewgame between games, and never within one.
+
+        Args:
+            pgn_paths: PGN files to work through, each possibly multi-game
+        """
+        for path in pgn_paths:
+            with open(path, "r", encoding="utf-8") as pgn_file:
+                while True:
+                    game = chess.pgn.read_game(pgn_file)
+                    if game is None:
+                        break
+
+                    self._game_token = object()
+                    print(f"\n{'=' * 60}")
+                    print(f"Analyzing {path}: "
+                          f"{game.headers.get('White', 'Unknown')} vs "
+                          f"{game.headers.get('Black', 'Unknown')}")
+
+                    analysis = self.analyze_game(game)
+                    worst_moves = self.find_worst_moves(analysis)
+                    self.print_worst_moves_report(game, worst_moves)
+
+    def _log(self, msg: str) -> None:
+        """Buffer a progress line; written out every LOG_FLUSH_INTERVAL lines."""
+        self._log_buf.append(msg)
+        if len(self._log_buf) >= LOG_FLUSH_INTERVAL:
+            self._flush_log()
+
+    def _flush_log(self) -> None:
+        if self._log_buf:
+            sys.stdout.write("\n".join(self._log_buf) + "\n")
+            self._log_buf.clear()
+
+    def _analyze_with_pooled_engine(self, board: chess.Board, time_limit: float) -> dict:
+        """Run analyze_position on whichever pooled engine is free."""
+        engine = self._engine_queue.get()
+        try:
+            return self.analyze_position(board, time_limit, engine=engine)
+        finally:
+            self._engine_queue.put(engine)
+
+    def _format_pv(self, pv_board: chess.Board, pv: List[chess.Move]) -> str:
+        """
+        Render a PV in SAN on a reusable board, restoring the board afterwards.
+        Avoids a full Board.copy() per render in the reporting paths.
+        """
+        san_moves = []
+        pushed = 0
+        try:
+            for m in pv:
+                try:
+                    san_moves.append(pv_board.san(m))
+                    pv_board.push(m)
+                    pushed += 1
+                except:
+                    san_moves.append(str(m))
+            return " ".join(san_moves)
+        finally:
+            for _ in range(pushed):
+                pv_board.pop()
+
     def _extract_evaluation(self, info: dict) -> Optional[float]:
         """Extract numerical evaluation from engine info."""
         if 'score' in info:
@@ -151,156 +466,187 @@ class GameAnalyzer:
                 return score.relative.cp / 100.0
         return None
 
-    def _calculate_eval_change(self, eval_before: Optional[float],
-                              eval_after: Optional[float]) -> Optional[float]:
+    def find_worst_moves(self, analysis: List[MoveAnalysis]) -> List[MoveAnalysis]:
         """
-        Calculate how much the evaluation changed after the move.
-        Positive values mean the move improved the position.
-        Negative values mean the move worsened the position.
+        Pick the TOP_N moves with the largest evaluation drops via an O(n)
+        argpartition instead of a full Python sort over dicts.
         """
-        if eval_before is None or eval_after is None:
-            return None
-
-        # Evaluations are relative to the side to move.
-        # eval_before is from the perspective of the player making the move.
-        # eval_after is from the perspective of the opponent.
-        # To compare, we negate eval_after to convert it to the player's perspective.
-        return (-eval_after) - eval_before
-
-    def find_worst_moves(self, analysis: List[dict]) -> List[dict]:
-        # Find all moves with valid evaluation changes
-        # Also filter out moves when the game is already decided
-        moves_with_change = [
-            m for m in analysis 
-            if m.get('eval_change') is not None and 
-            (m.get('eval_before') is None or abs(m.get('eval_before')) <= GAME_OVER_EVAL_THRESHOLD)
-        ]
-        
-        # Sort by evaluation change (most negative first)
-        moves_with_change.sort(key=lambda x: x['eval_change'])
-        
-        return moves_with_change[:TOP_N]
-
-    def analyze_position(self, board: chess.Board, time_limit: float) -> dict:
+        if not analysis:
+            return []
+
+        eval_change = np.array([np.nan if m.eval_change is None else m.eval_change
+                                for m in analysis])
+        eval_before = np.array([np.nan if m.eval_before is None else m.eval_before
+                                for m in analysis])
+
+        # A move counts if it has an eval change and the game wasn't already
+        # decided before it (same filter as the old list comprehension).
+        valid = ~np.isnan(eval_change) & (np.isnan(eval_before)
+                                          | (np.abs(eval_before) <= GAME_OVER_EVAL_THRESHOLD))
+
+        # Invalid entries sort to the end; partition out the TOP_N most
+        # negative changes, then order just those by value.
+        keys = np.where(valid, eval_change, np.inf)
+        top_n = min(TOP_N, len(analysis))
+        idx = np.argpartition(keys, top_n - 1)[:top_n]
+        idx = idx[np.argsort(keys[idx], kind="stable")]
+
+        return [analysis[i] for i in idx if valid[i]]
+
+    def analyze_position(self, board: chess.Board, time_limit: float,
+                         engine: Optional[chess.engine.SimpleEngine] = None,
+                         verbose: bool = False) -> dict:
         """
         Get detailed analysis of a position including best move and principal variation.
 
         Args:
             board: Current board position
             time_limit: Time limit for analysis (used only in time-based mode)
+            engine: Engine to use (defaults to the first pooled engine)
+            verbose: Print best-move changes and the final PV while searching
+                (off for batch analysis, where workers would interleave)
 
         Returns:
             Dictionary with analysis results (including 'time_taken')
         """
-        if not self.engine:
+        if engine is None:
+            engine = self.engine
+        if not engine:
             raise RuntimeError("Engine not initialized. Use with statement.")
 
+        # Reuse a cached analysis of the identical position if it is at least
+        # as deep: any stability run qualifies, a time-based run only if it
+        # spent at least as long as we were about to.
+        if isinstance(board, ZobristBoard):
+            cache_key = board.zobrist_key
+        else:
+            cache_key = chess.polyglot.zobrist_hash(board)
+        cached = self._pos_cache.get(cache_key)
+        if cached is not None and (cached['stable'] or time_limit <= cached['time_taken']):
+            return dict(cached)
+
+        # Quick calls (early moves, decided positions) are always time-based;
+        # deep calls go straight to the implementation __enter__ bound for
+        # the configured mode, with no per-call ANALYSIS_MODE test.
+        if time_limit == QUICK_ANALYSIS_TIME:
+            analysis_result = self._analyze_position_time(board, time_limit, engine)
+        else:
+            analysis_result = self._deep_analyze(board, time_limit, engine, verbose)
+
+        self._pos_cache[cache_key] = analysis_result
+        return analysis_result
+
+    def _analyze_position_stability(self, board: chess.Board, time_limit: float,
+                                    engine: chess.engine.SimpleEngine,
+                                    verbose: bool = False) -> dict:
+        """Deep analysis that stops once the best move has been stable long enough."""
+        # Bind the hot config global once: the info loop then reads a local
+        # (LOAD_FAST) instead of probing the module dict per line.
+        stability_threshold = STABILITY_THRESHOLD
         start_time = time.time()
-        
-        # Force time-based mode for quick analysis (early moves)
-        use_stability = ANALYSIS_MODE == "stability" and time_limit != QUICK_ANALYSIS_TIME
-        
-        if use_stability:
-            # Stability-based mode: stop when best move is stable for STABILITY_THRESHOLD seconds
-            last_best_move = None
-            last_change_time = start_time
-            best_pv = None
-            best_eval = None
-            last_depth = 0
-            
-            # Use a very long time limit for the engine, but we'll stop early based on stability
-            with self.engine.analysis(board, chess.engine.Limit(time=86400.0)) as analysis:
-                for info in analysis:
-                    current_pv = info.get("pv")
-                    current_depth = info.get("depth", 0)
-                    if not current_pv:
-                        continue
-                    
-                    current_best_move = current_pv[0]
-                    current_eval = self._extract_evaluation(info)
-                    
-                    # Check if best move changed
-                    if current_best_move != last_best_move:
-                        is_initial = last_best_move is None
-                        last_best_move = current_best_move
-                        last_change_time = time.time()
-                        best_pv = list(current_pv)
-                        best_eval = current_eval
-                        last_depth = current_depth
-                        
-                        # Print when best move changes
-                        elapsed = time.time() - start_time
-                        eval_str = f"{current_eval:+.2f}" if current_eval is not None else "None"
-                        
-                        # Format PV for display
-                        temp_board = board.copy()
-                        san_moves = []
-                        for m in current_pv[:7]:
-                            try:
-                                san_moves.append(temp_board.san(m))
-                                temp_board.push(m)
-                            except:
-                                san_moves.append(str(m))
-                        pv_str = " ".join(san_moves)
-                        
+
+        last_best_move = None
+        last_change_engine_time = 0.0
+        best_pv = None
+        best_eval = None
+        last_depth = 0
+
+        # Use a very long time limit for the engine, but we'll stop early based on stability
+        with engine.analysis(board, chess.engine.Limit(time=86400.0),
+                             game=self._game_token) as analysis:
+            for info in analysis:
+                current_pv = info.get("pv")
+                if not current_pv:
+                    continue
+
+                # Keep refinements as they arrive. python-chess hands us a
+                # fresh list per info line, so holding the reference is safe.
+                best_pv = current_pv
+                best_eval = self._extract_evaluation(info)
+                last_depth = info.get("depth", 0)
+
+                # The engine reports its own search time on each info line
+                # (parsed to seconds); no time.time() syscalls needed here.
+                engine_time = info.get("time", 0.0)
+
+                current_best_move = current_pv[0]
+                if current_best_move != last_best_move:
+                    is_initial = last_best_move is None
+                    last_best_move = current_best_move
+                    last_change_engine_time = engine_time
+
+                    if verbose:
+                        # Minimal on-change report; the full PV is rendered
+                        # once after the loop, not on the hot reader path.
+                        eval_str = f"{best_eval:+.2f}" if best_eval is not None else "None"
                         if is_initial:
-                            print(f"    [{elapsed:6.1f}s] Best variation (depth {current_depth}): Eval {eval_str}")
-                            print(f"    PV: {pv_str}")
+                            print(f"    [{engine_time:6.1f}s] Best variation (depth {last_depth}): Eval {eval_str}")
                         else:
                             try:
                                 best_move_san = board.san(current_best_move)
                             except:
                                 best_move_san = str(current_best_move)
-                            print(f"    [{elapsed:6.1f}s] Best move CHANGED to {best_move_san} (depth {current_depth}): Eval {eval_str}")
-                            print(f"    PV: {pv_str}")
-                    else:
-                        # Best move unchanged, check if we've been stable long enough
-                        current_time = time.time()
-                        stability_elapsed = current_time - last_change_time
-                        if stability_elapsed >= STABILITY_THRESHOLD:
-                            # Stable for threshold duration, stop analysis
-                            elapsed = time.time() - start_time
-                            print(f"    [{elapsed:6.1f}s] ✓ Stable for {STABILITY_THRESHOLD}s - moving to next move")
-                            break
-                        # Update PV and eval even if best move hasn't changed (refinement)
-                        best_pv = list(current_pv)
-                        best_eval = current_eval
-                        last_depth = current_depth
-            
-            end_time = time.time()
-            
-            analysis_result = {
-                'best_move': last_best_move,
-                'evaluation': best_eval,
-                'principal_variation': best_pv[:7] if best_pv else [],
-                'time_taken': end_time - start_time
-            }
+                            print(f"    [{engine_time:6.1f}s] Best move CHANGED to {best_move_san} (depth {last_depth}): Eval {eval_str}")
+                elif engine_time - last_change_engine_time >= stability_threshold:
+                    if verbose:
+                        print(f"    [{engine_time:6.1f}s] ✓ Stable for {stability_threshold}s - moving to next move")
+                    break
+
+        end_time = time.time()
+
+        # SAN is only rendered when someone is watching; the raw PV moves are
+        # in the result either way.
+        if verbose and best_pv:
+            print(f"    PV: {self._format_pv(board.copy(stack=False), best_pv[:7])}")
+
+        return {
+            'best_move': last_best_move,
+            'evaluation': best_eval,
+            'principal_variation': best_pv[:7] if best_pv else [],
+            'time_taken': end_time - start_time,
+            'stable': True
+        }
+
+    def _analyze_position_time(self, board: chess.Board, time_limit: float,
+                               engine: chess.engine.SimpleEngine,
+                               verbose: bool = False) -> dict:
+        """Fixed-budget analysis (time mode, and every quick call in any mode)."""
+        start_time = time.time()
+
+        # Quick calls are depth-bounded with the time as a cap: with the hash
+        # table warm from neighbouring positions the depth is usually hit
+        # well inside the time budget, so these return early instead of
+        # always burning the full slice.
+        if time_limit == QUICK_ANALYSIS_TIME:
+            limit = chess.engine.Limit(depth=QUICK_ANALYSIS_DEPTH, time=QUICK_ANALYSIS_TIME)
         else:
-            # Time-based mode: use fixed time limit
-            info = self.engine.analyse(board, chess.engine.Limit(time=time_limit),
-                                     multipv=1, info=chess.engine.INFO_ALL)
-            end_time = time.time()
+            limit = chess.engine.Limit(time=time_limit)
+        info = engine.analyse(board, limit, multipv=1,
+                              info=chess.engine.INFO_ALL, game=self._game_token)
+        end_time = time.time()
 
-            analysis_result = {
-                'best_move': None,
-                'evaluation': None,
-                'principal_variation': [],
-                'time_taken': end_time - start_time
-            }
+        analysis_result = {
+            'best_move': None,
+            'evaluation': None,
+            'principal_variation': [],
+            'time_taken': end_time - start_time,
+            'stable': False
+        }
 
-            if info:
-                info = info[0] if isinstance(info, list) else info
+        if info:
+            info = info[0] if isinstance(info, list) else info
 
-                if 'pv' in info and info['pv']:
-                    analysis_result['best_move'] = info['pv'][0]
-                    analysis_result['principal_variation'] = info['pv'][:7]  # First 7 moves of PV
+            if 'pv' in info and info['pv']:
+                analysis_result['best_move'] = info['pv'][0]
+                analysis_result['principal_variation'] = info['pv'][:7]  # First 7 moves of PV
 
-                if 'score' in info:
-                    analysis_result['evaluation'] = self._extract_evaluation(info)
+            if 'score' in info:
+                analysis_result['evaluation'] = self._extract_evaluation(info)
 
         return analysis_result
 
-    def analyze_specific_move(self, board: chess.Board, duration_seconds: float, actual_move: Optional[chess.Move] = None):
+    def analyze_specific_move(self, board: chess.Board, duration_seconds: float,
+                              actual_move: Optional[chess.Move] = None) -> None:
         """
         Analyze a specific position, reporting when the best variation changes.
         Uses time-based or stability-based mode depending on ANALYSIS_MODE global.
@@ -349,7 +695,7 @@ class GameAnalyzer:
         last_eval = None
         last_depth = 0
         last_best_move = None
-        last_change_time = start_time  # Track when best move last changed (for stability mode)
+        last_change_engine_time = 0.0  # Engine search time of the last best-move change
         
         # Set up analysis limit based on mode
         if ANALYSIS_MODE == "stability":
@@ -359,53 +705,52 @@ class GameAnalyzer:
             # Time-based mode: use the provided duration
             analysis_limit = chess.engine.Limit(time=duration_seconds)
         
+        # One reusable board for all PV rendering; _format_pv restores it
+        # after each render, so no per-change Board.copy() is needed.
+        pv_board = board.copy(stack=False)
+
         # Use AnalysisResult as a context manager for streaming
         with self.engine.analysis(board, analysis_limit) as analysis:
             for info in analysis:
                 current_pv = info.get("pv")
-                current_eval = self._extract_evaluation(info)
-                current_depth = info.get("depth", 0)
-                
                 if not current_pv:
                     continue
-                
+
+                current_eval = self._extract_evaluation(info)
+                current_depth = info.get("depth", 0)
+                # Engine-reported search time (seconds); replaces per-line
+                # time.time() sampling for the stop checks below.
+                engine_time = info.get("time", 0.0)
                 display_pv = current_pv
-                
+
                 # A meaningful change is when the best move (first move) changes, or it's the initial variation.
                 # We skip printing when the variation is refined but the first move stays the same.
                 current_best_move = display_pv[0]
                 best_move_changed = last_pv is None or current_best_move != last_best_move
-                
+
+                # Track refinements by reference; python-chess hands us a fresh
+                # list per info line, so no copy is needed.
+                last_pv = display_pv
+                last_eval = current_eval
+
                 if best_move_changed:
-                    elapsed = time.time() - start_time
+                    elapsed = engine_time
+                    last_change_engine_time = engine_time
                     eval_str = f"{current_eval:+.2f}" if current_eval is not None else "None"
-                    
-                    # Store the displayed PV for future comparison
-                    last_pv = list(display_pv)
-                    last_change_time = time.time()  # Update change time when best move changes
-                    
+
                     # Correctly format PV for display
-                    temp_board = board.copy()
-                    
                     try:
-                        best_move_san = temp_board.san(current_best_move)
+                        best_move_san = pv_board.san(current_best_move)
                     except:
                         best_move_san = str(current_best_move)
 
-                    san_moves = []
-                    for m in display_pv:
-                        try:
-                            san_moves.append(temp_board.san(m))
-                            temp_board.push(m)
-                        except:
-                            san_moves.append(str(m))
-                    pv_str = " ".join(san_moves)
-                    
+                    pv_str = self._format_pv(pv_board, display_pv)
+
                     if last_depth == 0:
                         print(f"[{elapsed:6.1f}s] Initial best variation (depth {current_depth}):")
                     else:
                         print(f"[{elapsed:6.1f}s] Best move CHANGED to {best_move_san} (depth {current_depth}):")
-                        
+
                     print(f"          Eval: {eval_str}")
                     if actual_move_eval is not None and current_eval is not None:
                         eval_diff = current_eval - actual_move_eval
@@ -416,29 +761,19 @@ class GameAnalyzer:
                         else:
                             print(f"          PV advantage over move played: 0.00 pawns (equal)")
                     print(f"          PV  : {pv_str}")
-                    
-                    last_eval = current_eval
+
                     last_depth = current_depth
                     last_best_move = current_best_move
                 else:
-                    # Update tracking variables even when we don't print
-                    last_pv = list(display_pv)
-                    last_eval = current_eval
                     last_depth = current_depth
-                    last_best_move = current_best_move
-                    
-                    # In stability mode, check if we've been stable long enough
                     if ANALYSIS_MODE == "stability":
-                        current_time = time.time()
-                        if (current_time - last_change_time) >= STABILITY_THRESHOLD:
+                        if engine_time - last_change_engine_time >= STABILITY_THRESHOLD:
                             # Stable for threshold duration, stop analysis
-                            elapsed = time.time() - start_time
-                            print(f"[{elapsed:6.1f}s] Best move stable for {STABILITY_THRESHOLD}s - stopping analysis")
+                            print(f"[{engine_time:6.1f}s] Best move stable for {STABILITY_THRESHOLD}s - stopping analysis")
                             break
-                
-                # Stop if we've exceeded time (time-based mode only)
-                if ANALYSIS_MODE == "time" and time.time() - start_time > duration_seconds:
-                    break
+                    elif engine_time > duration_seconds:
+                        # Stop if we've exceeded time (time-based mode only)
+                        break
 
         print("-" * 60)
         elapsed_total = time.time() - start_time
@@ -447,15 +782,7 @@ class GameAnalyzer:
         else:
             print(f"Analysis complete after {elapsed_total:.1f}s")
         if last_pv:
-            temp_board = board.copy()
-            san_moves = []
-            for m in last_pv[:7]:
-                try:
-                    san_moves.append(temp_board.san(m))
-                    temp_board.push(m)
-                except:
-                    san_moves.append(str(m))
-            pv_str = " ".join(san_moves)
+            pv_str = self._format_pv(pv_board, last_pv[:7])
             print(f"Final best variation: {pv_str} (Eval: {last_eval:+.2f})")
             if actual_move_eval is not None and last_eval is not None:
                 eval_diff = last_eval - actual_move_eval
@@ -466,7 +793,7 @@ class GameAnalyzer:
                 else:
                     print(f"PV advantage over move played: 0.00 pawns (equal)")
 
-    def print_worst_moves_report(self, game: chess.pgn.Game, worst_moves: List[dict]):
+    def print_worst_moves_report(self, game: chess.pgn.Game, worst_moves: List[MoveAnalysis]) -> None:
         """Print a report focusing on the worst moves with detailed analysis."""
         print("Chess Game Analysis: Worst Moves Against Stockfish")
         print("=" * 60)
@@ -482,15 +809,15 @@ class GameAnalyzer:
         print("-" * 50)
 
         for i, move_data in enumerate(worst_moves, 1):
-            move_num = move_data['move_number']
-            player = move_data['player']
-            move = move_data['move']
-            move_str = move_data.get('san', str(move))
-            eval_change = move_data['eval_change']
-            position_analysis = move_data['position_analysis']
+            move_num = move_data.move_number
+            player = move_data.player
+            move = move_data.move
+            move_str = move_data.san or str(move)
+            eval_change = move_data.eval_change
+            position_analysis = move_data.position_analysis
 
             # In one-pass, total time spent to evaluate this move's swing
-            total_time = move_data['time_taken_before'] + move_data['time_taken_after']
+            total_time = move_data.time_taken_before + move_data.time_taken_after
             print(f"{i}. Move {move_num:2d}. {player:5s} played {move_str}")
             print(f"   Evaluation change: {eval_change:+.2f} pawns (Analysis time: {total_time:.1f}s)")
             
@@ -515,9 +842,9 @@ class GameAnalyzer:
         print("-" * 20)
         if worst_moves:
             worst = worst_moves[0]
-            worst_move_str = worst.get('san', str(worst['move']))
-            print(f"🎯 Largest swing: Move {worst['move_number']}. {worst['player']} played {worst_move_str}")
-            print(f"   Evaluation dropped by {worst['eval_change']:+.2f} pawns")
+            worst_move_str = worst.san or str(worst.move)
+            print(f"🎯 Largest swing: Move {worst.move_number}. {worst.player} played {worst_move_str}")
+            print(f"   Evaluation dropped by {worst.eval_change:+.2f} pawns")
         else:
             print("No decisive mistakes detected within the configured thresholds.")
         print("📝 Note: Large evaluation changes in already won/lost positions carry less insight.")
@@ -531,15 +858,16 @@ class GameAnalyzer:
         print()
         # Note: This is only the time for worst moves + positions. 
         # The full scan time isn't tracked here easily without passing more data.
-        print(f"Total time spent on top critical moves analysis: {sum(m['time_taken_before'] + m['time_taken_after'] for m in worst_moves):.1f}s")
+        print(f"Total time spent on top critical moves analysis: {sum(m.time_taken_before + m.time_taken_after for m in worst_moves):.1f}s")
         print()
 
 
-def main():
+def main() -> None:
     """Run the analysis for the provided PGN (file or built-in sample)."""
 
     parser = argparse.ArgumentParser(description="Analyze a chess PGN for decisive mistakes.")
-    parser.add_argument("pgn_file", nargs="?", help="Path to the PGN file to analyze.")
+    parser.add_argument("pgn_file", nargs="*",
+                        help="PGN file(s) to analyze; several files are batched on one engine pool.")
     parser.add_argument("--debug", action="store_true",
                         help="Print per-move evaluations to help diagnose analysis output.")
     parser.add_argument("--analyze-move", type=int, help="Specific move number to analyze deeply.")
@@ -549,11 +877,7 @@ def main():
                         help="Duration in seconds for move analysis (default: 240.0).")
     args = parser.parse_args()
 
-    if args.pgn_file:
-        with open(args.pgn_file, "r", encoding="utf-8") as pgn_file:
-            pgn_game = pgn_file.read()
-    else:
-        pgn_game = '''[Event "Local Event"]
+    sample_pgn = '''[Event "Local Event"]
 [Site "Local Site"]
 [Date "2025.11.22"]
 [Round "1"]
@@ -578,8 +902,23 @@ Rd7 15. O-O Ka7 16. Bxb7 Rxb7 17. Qa4+ Kb8 18. Qe8+ Ka7 19. Qa4+ Kb8 20. Bc3 Qd6
 '''
 
     with GameAnalyzer() as analyzer:
+        # Batch mode: several PGN files share one warm engine pool
+        if len(args.pgn_file) > 1:
+            if args.analyze_move:
+                print("Error: --analyze-move works on a single PGN file.")
+                return
+            analyzer.analyze_batch(args.pgn_file)
+            return
+
         # Load the game
-        game = analyzer.load_game_from_pgn(pgn_game)
+        if args.pgn_file:
+            # Stream straight from the open file: chess.pgn.read_game only
+            # consumes one game's worth of lines, so peak memory stays at one
+            # game instead of the whole file plus a StringIO copy.
+            with open(args.pgn_file[0], "r", encoding="utf-8") as pgn_file:
+                game = chess.pgn.read_game(pgn_file)
+        else:
+            game = analyzer.load_game_from_pgn(sample_pgn)
 
         if args.analyze_move:
             print(f"Deeply analyzing move {args.analyze_move} for {args.color}...")
@@ -617,14 +956,14 @@ Rd7 15. O-O Ka7 16. Bxb7 Rxb7 17. Qa4+ Kb8 18. Qe8+ Ka7 19. Qa4+ Kb8 20. Bc3 Qd6
             print(f"{'Move':>4s} {'Ply':>3s} {'Player':>5s} {'Move':>8s} "
                   f"{'EvalBefore':>12s} {'EvalAfter':>12s} {'ΔEval':>8s}")
             for move in analysis:
-                eval_before = move.get('eval_before')
-                eval_after = move.get('eval_after')
-                eval_change = move.get('eval_change')
+                eval_before = move.eval_before
+                eval_after = move.eval_after
+                eval_change = move.eval_change
                 eval_before_str = f"{eval_before:+.2f}" if eval_before is not None else "None"
                 eval_after_str = f"{eval_after:+.2f}" if eval_after is not None else "None"
                 eval_change_str = f"{eval_change:+.2f}" if eval_change is not None else "None"
-                print(f"{move['move_number']:4d} {move['ply_index']:3d} "
-                      f"{move['player'][:5]:>5s} {str(move['move']):>8s} "
+                print(f"{move.move_number:4d} {move.ply_index:3d} "
+                      f"{move.player[:5]:>5s} {str(move.move):>8s} "
                       f"{eval_before_str:>12s} {eval_after_str:>12s} "
                       f"{eval_change_str:>8s}")
             print("-" * 60)